@@ -0,0 +1,36 @@
+"""
+Build step: export the embedding model to ONNX and quantize it to int8
+The RAG engine picks up the result from backend/onnx_model (or $RAG_ONNX_MODEL_DIR)
+
+Requires: pip install optimum[onnxruntime]
+Usage: python build_onnx.py [output_dir]
+"""
+import sys
+import os
+
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def build(output_dir: str):
+    """Export MODEL_ID to ONNX and write an int8 (AVX-512 VNNI) quantized copy"""
+    print(f"Exporting {MODEL_ID} to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(MODEL_ID, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+
+    print("Quantizing to int8...")
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+
+    print(f"✅ ONNX model written to: {os.path.abspath(output_dir)}")
+
+
+if __name__ == "__main__":
+    default_dir = os.path.join(os.path.dirname(__file__), "onnx_model")
+    build(sys.argv[1] if len(sys.argv) > 1 else default_dir)
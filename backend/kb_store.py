@@ -0,0 +1,72 @@
+"""
+Knowledge base article storage shared by the RAG backends
+Loads KB articles into a struct-of-arrays layout built once at load time
+"""
+
+import os
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List
+
+try:
+    # C-extension parser, ~3x faster than the stdlib json module
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@dataclass
+class KBStore:
+    """KB articles as parallel arrays; index i across all fields is one article"""
+    titles: np.ndarray
+    contents: np.ndarray
+    categories: np.ndarray
+    tags: List[List[str]]
+    filenames: np.ndarray
+    # Pre-built "title\n\ncontent" texts for vectorizers/encoders
+    joined: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.titles)
+
+
+def _read_article(filepath: str) -> Dict:
+    """Read and parse a single KB article JSON file"""
+    if orjson is not None:
+        with open(filepath, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_kb_store(kb_articles_path: str) -> KBStore:
+    """
+    Load all KB articles from JSON files in a directory
+    
+    Args:
+        kb_articles_path: Path to directory containing KB articles
+    
+    Returns:
+        KBStore with one entry per article, ordered by filename
+    """
+    filenames = sorted(f for f in os.listdir(kb_articles_path) if f.endswith('.json'))
+    
+    # Reads are latency-bound on network-backed filesystems, so fan them out
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        articles = list(executor.map(
+            _read_article, [os.path.join(kb_articles_path, f) for f in filenames]
+        ))
+    
+    titles = [a['title'] for a in articles]
+    contents = [a['content'] for a in articles]
+    
+    return KBStore(
+        titles=np.array(titles, dtype=object),
+        contents=np.array(contents, dtype=object),
+        categories=np.array([a.get('category', 'General') for a in articles], dtype=object),
+        tags=[a.get('tags', []) for a in articles],
+        filenames=np.array(filenames, dtype=object),
+        joined=np.array([f"{t}\n\n{c}" for t, c in zip(titles, contents)], dtype=object)
+    )
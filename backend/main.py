@@ -1,16 +1,24 @@
 """
 FastAPI Backend for Hiver RAG System - Vercel Serverless Compatible
 Provides REST API endpoints for querying the knowledge base
+
+Set RAG_MODE=dense for SentenceTransformer + FAISS retrieval with OpenAI answers;
+the default (tfidf) needs only scikit-learn and never imports torch
 """
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
 import os
+import json
+import time
 from dotenv import load_dotenv
 
-from rag_engine import RAGEngine
+from retriever import Retriever, DenseRetriever, TfidfRetriever
 
 # Load environment variables
 load_dotenv()
@@ -19,7 +27,8 @@ load_dotenv()
 app = FastAPI(
     title="Hiver RAG API",
     description="Retrieval-Augmented Generation API for Hiver Knowledge Base",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS - Allow all origins for Vercel deployment
@@ -31,26 +40,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize RAG engine (will be cached by Vercel)
+
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip responses except SSE streams, where compression would buffer tokens"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Compress text-heavy JSON responses (article previews + answer)
+app.add_middleware(StreamAwareGZipMiddleware, minimum_size=512)
+
+# Initialize retriever (will be cached by Vercel)
 KB_ARTICLES_PATH = os.path.join(os.path.dirname(__file__), "..", "kb_articles")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+RAG_MODE = "dense" if os.getenv("RAG_MODE", "").lower() == "dense" else "tfidf"
+RetrieverImpl = DenseRetriever if RAG_MODE == "dense" else TfidfRetriever
 
-# Global variable to cache RAG engine
-_rag_engine = None
+# Global variable to cache the retriever
+_rag_engine: Optional[Retriever] = None
+# Time of the last failed initialization; retried after INIT_RETRY_SECONDS
+_rag_engine_failed_at: Optional[float] = None
+INIT_RETRY_SECONDS = 30.0
+# Serializes (re)initialization so concurrent requests don't each build a retriever
+_init_lock = asyncio.Lock()
 
-def get_rag_engine():
-    """Get or initialize RAG engine (singleton pattern for serverless)"""
-    global _rag_engine
-    if _rag_engine is None:
-        try:
-            _rag_engine = RAGEngine(KB_ARTICLES_PATH, OPENAI_API_KEY)
-            print("RAG Engine initialized successfully!")
-        except Exception as e:
-            print(f"Error initializing RAG engine: {e}")
-            _rag_engine = None
+def _init_rag_engine():
+    """Build the retriever and run a dummy search so no request pays the cold start"""
+    global _rag_engine, _rag_engine_failed_at
+    try:
+        _rag_engine = RetrieverImpl(KB_ARTICLES_PATH, OPENAI_API_KEY)
+        # Loads model weights (dense mode) and runs one query through the index
+        _rag_engine.search("warmup")
+        _rag_engine_failed_at = None
+        print(f"RAG Engine ({RAG_MODE}) initialized successfully!")
+    except Exception as e:
+        print(f"Error initializing RAG engine: {e}")
+        _rag_engine = None
+        _rag_engine_failed_at = time.monotonic()
+
+def _init_due() -> bool:
+    """Whether the retriever is missing and not inside the post-failure backoff"""
+    return _rag_engine is None and (
+        _rag_engine_failed_at is None
+        or time.monotonic() - _rag_engine_failed_at >= INIT_RETRY_SECONDS
+    )
+
+async def get_rag_engine() -> Optional[Retriever]:
+    """Get the retriever initialized at startup (None if initialization is failing)"""
+    # Serverless runtimes may skip lifespan events; initialize on first use then.
+    # After a failure (e.g. model download, KB read), retry once the backoff has elapsed.
+    # Initialization loads models and reads the KB, so it runs off the event loop.
+    if _init_due():
+        async with _init_lock:
+            if _init_due():
+                await asyncio.to_thread(_init_rag_engine)
     return _rag_engine
 
 
+@app.on_event("startup")
+async def warm_up():
+    """Initialize the retriever before the first request"""
+    await get_rag_engine()
+
+
 # Request/Response models
 class QueryRequest(BaseModel):
     query: str
@@ -83,6 +139,7 @@ async def root():
         "status": "running",
         "endpoints": {
             "query": "/api/query",
+            "query_stream": "/api/query/stream",
             "health": "/api/health",
             "stats": "/api/stats"
         }
@@ -91,15 +148,16 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint"""
-    rag_engine = get_rag_engine()
+    """Health check endpoint (reports state only; never triggers initialization)"""
     return {
         "status": "healthy",
-        "rag_engine_initialized": rag_engine is not None,
+        "rag_engine_initialized": _rag_engine is not None,
+        "rag_mode": RAG_MODE,
         "openai_configured": OPENAI_API_KEY is not None and len(OPENAI_API_KEY) > 0
     }
 
 
+# response_model documents the schema; returning a Response object skips its validation
 @app.post("/api/query", response_model=QueryResponse)
 async def query_kb(request: QueryRequest):
     """
@@ -110,8 +168,9 @@ async def query_kb(request: QueryRequest):
         
     Returns:
         QueryResponse with retrieved articles, generated answer, and confidence score
+        (serialized with orjson, skipping response-side Pydantic validation)
     """
-    rag_engine = get_rag_engine()
+    rag_engine = await get_rag_engine()
     
     if not rag_engine:
         raise HTTPException(
@@ -129,8 +188,8 @@ async def query_kb(request: QueryRequest):
         # Process query through RAG engine
         # Use fast mode (no LLM) if OpenAI is not configured for better performance
         generate_answer = OPENAI_API_KEY is not None and len(OPENAI_API_KEY) > 0
-        result = rag_engine.query(request.query, k=request.k, generate_answer=generate_answer)
-        return result
+        result = await rag_engine.aquery(request.query, k=request.k, generate_answer=generate_answer)
+        return ORJSONResponse(result)
     
     except Exception as e:
         raise HTTPException(
@@ -139,10 +198,50 @@ async def query_kb(request: QueryRequest):
         )
 
 
+@app.post("/api/query/stream")
+async def query_kb_stream(request: QueryRequest):
+    """
+    Query the knowledge base and stream the answer as Server-Sent Events
+    
+    The first event ('retrieval') carries the retrieved articles and confidence score,
+    followed by 'token' events with answer fragments and a final 'done' event.
+    
+    Args:
+        request: QueryRequest containing the user query and optional parameters
+        
+    Returns:
+        StreamingResponse with media type text/event-stream
+    """
+    rag_engine = await get_rag_engine()
+    
+    if not rag_engine:
+        raise HTTPException(
+            status_code=500,
+            detail="RAG engine not initialized. Check server logs."
+        )
+    
+    if not request.query or len(request.query.strip()) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Query cannot be empty"
+        )
+    
+    generate_answer = OPENAI_API_KEY is not None and len(OPENAI_API_KEY) > 0
+    
+    async def event_stream():
+        try:
+            async for event, data in rag_engine.astream_query(request.query, k=request.k, generate_answer=generate_answer):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error processing query: {str(e)}'})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.get("/api/stats")
 async def get_stats():
     """Get statistics about the knowledge base"""
-    rag_engine = get_rag_engine()
+    rag_engine = await get_rag_engine()
     
     if not rag_engine:
         raise HTTPException(
@@ -150,11 +249,7 @@ async def get_stats():
             detail="RAG engine not initialized"
         )
     
-    return {
-        "total_articles": len(rag_engine.vector_store.documents),
-        "embedding_dimension": rag_engine.embedding_model.dimension,
-        "model_name": "all-MiniLM-L6-v2"
-    }
+    return rag_engine.stats()
 
 
 # Vercel serverless function handler
@@ -4,55 +4,249 @@ Handles embeddings, vector search, and answer generation with confidence scoring
 """
 
 import os
-import json
+import re
+import time
+import asyncio
+import threading
+import pickle
+import hashlib
 import numpy as np
-from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional, AsyncIterator
 import faiss
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+
+from kb_store import load_kb_store
+from scoring import calculate_confidence
+
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(__file__), ".rag_index")
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(__file__), "onnx_model")
+
+# A sentence runs to terminal punctuation followed by whitespace, or to the end of the line
+_SENTENCE_RE = re.compile(r'\S.*?(?:[.!?](?=\s)|$)', re.MULTILINE)
+_WORD_RE = re.compile(r'\S+')
+
+
+def chunk_text(content: str, size: int = 150, overlap: int = 30) -> List[str]:
+    """
+    Split text into overlapping windows of at most `size` words on sentence boundaries
+    
+    Args:
+        content: Text to split
+        size: Maximum words per chunk
+        overlap: Approximate number of trailing words repeated at the start of the next chunk
+        
+    Returns:
+        List of chunk strings, sliced from the original text so formatting is preserved
+    """
+    # (start, end, word_count) spans; sentences longer than `size` become word windows
+    # that overlap each other, since the sentence step-back below cannot split them
+    stride = max(1, size - overlap)
+    pieces = []
+    for sentence in _SENTENCE_RE.finditer(content):
+        words = list(_WORD_RE.finditer(content, sentence.start(), sentence.end()))
+        starts = [0] if len(words) <= size else range(0, len(words) - overlap, stride)
+        for i in starts:
+            group = words[i:i + size]
+            pieces.append((group[0].start(), group[-1].end(), len(group)))
+    
+    chunks = []
+    start = 0
+    while start < len(pieces):
+        end, count = start, 0
+        while end < len(pieces) and (count == 0 or count + pieces[end][2] <= size):
+            count += pieces[end][2]
+            end += 1
+        chunks.append(content[pieces[start][0]:pieces[end - 1][1]])
+        if end >= len(pieces):
+            break
+        
+        # Step back over trailing sentences until about `overlap` words are repeated
+        next_start, repeated = end, 0
+        while next_start - 1 > start and repeated + pieces[next_start - 1][2] <= overlap:
+            next_start -= 1
+            repeated += pieces[next_start][2]
+        start = next_start
+    
+    return chunks
 
 
 class EmbeddingModel:
-    """Handles text embedding generation using sentence-transformers"""
+    """Handles text embedding generation using ONNX Runtime or sentence-transformers"""
+    
+    # Preferred first: int8 model written by build_onnx.py, then the plain export
+    ONNX_FILES = ("model_quantized.onnx", "model.onnx")
+    MAX_SEQ_LENGTH = 256
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", onnx_dir: str = None):
         """
         Initialize the embedding model
         
+        Uses the ONNX export from build_onnx.py when present and onnxruntime is
+        installed; otherwise falls back to SentenceTransformer. Either backend is
+        loaded on first use, so an engine serving a persisted index does not pay
+        the model load at startup.
+        
         Args:
             model_name: Name of the sentence-transformers model
+            onnx_dir: Directory of the ONNX export (defaults to $RAG_ONNX_MODEL_DIR or backend/onnx_model)
         """
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        self.dimension = self.model.get_sentence_embedding_dimension()
-        print(f"Model loaded. Embedding dimension: {self.dimension}")
+        self.model_name = model_name
+        self.onnx_dir = onnx_dir or os.getenv("RAG_ONNX_MODEL_DIR") or DEFAULT_ONNX_DIR
+        self.onnx_path = self._find_onnx_model(self.onnx_dir)
+        self._model = None
+        self._session = None
+        self._tokenizer = None
+        # Per-instance memo so the cache is freed with the model (a decorator would pin self)
+        self.encode_one = lru_cache(maxsize=1024)(self._encode_one)
+    
+    @staticmethod
+    def _find_onnx_model(onnx_dir: str) -> Optional[str]:
+        """Return the ONNX model path if it exists and its runtime is installed"""
+        import importlib.util
+        
+        if importlib.util.find_spec("onnxruntime") is None or importlib.util.find_spec("transformers") is None:
+            return None
+        for filename in EmbeddingModel.ONNX_FILES:
+            path = os.path.join(onnx_dir, filename)
+            if os.path.exists(path):
+                return path
+        return None
+    
+    @property
+    def backend(self) -> str:
+        """Identifier of the embedding backend in use"""
+        if self.onnx_path:
+            return f"onnx:{os.path.basename(self.onnx_path)}"
+        return "sentence-transformers"
     
-    def encode(self, texts: List[str]) -> np.ndarray:
+    @property
+    def session(self):
+        """Create the ONNX Runtime session and tokenizer on first access"""
+        if self._session is None:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+            
+            print(f"Loading ONNX embedding model: {self.onnx_path}")
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+            self._session = ort.InferenceSession(
+                self.onnx_path, options, providers=["CPUExecutionProvider"]
+            )
+            self._input_names = [i.name for i in self._session.get_inputs()]
+        return self._session
+    
+    @property
+    def model(self):
+        """Load the SentenceTransformer on first access"""
+        if self._model is None:
+            import torch
+            from sentence_transformers import SentenceTransformer
+            
+            print(f"Loading embedding model: {self.model_name}")
+            model = SentenceTransformer(self.model_name)
+            if torch.cuda.is_available():
+                # FP16 halves memory traffic on GPU
+                model = model.half()
+            else:
+                # Dynamic int8 quantization of the transformer's Linear layers on CPU
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self._model = model
+            print(f"Model loaded. Embedding dimension: {self.dimension}")
+        return self._model
+    
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension of the model"""
+        if self.onnx_path:
+            return int(self.session.get_outputs()[0].shape[-1])
+        return self.model.get_sentence_embedding_dimension()
+    
+    def encode(self, texts: List[str], batch_size: int = 128) -> np.ndarray:
         """
         Generate embeddings for a list of texts
         
         Args:
             texts: List of text strings to embed
+            batch_size: Number of texts per forward pass
             
         Returns:
-            numpy array of embeddings
+            numpy array of L2-normalized embeddings
         """
-        return self.model.encode(texts, convert_to_numpy=True)
+        if self.onnx_path:
+            return self._encode_onnx(texts, batch_size)
+        
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+    
+    def _encode_one(self, text: str) -> bytes:
+        """
+        Embed a single query; exposed memoized on the exact string as encode_one
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Raw float32 bytes of the L2-normalized embedding (rebuild with np.frombuffer)
+        """
+        return self.encode([text], batch_size=1)[0].astype(np.float32).tobytes()
+    
+    def _encode_onnx(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Tokenize, run the ONNX session, mean-pool over the attention mask and L2-normalize"""
+        session = self.session
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self._tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self._input_names}
+            hidden = session.run(None, feeds)[0]
+            
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        
+        return np.concatenate(batches).astype(np.float32)
 
 
 class VectorStore:
     """FAISS-based vector storage and similarity search"""
     
-    def __init__(self, dimension: int):
+    # HNSW only beats an exhaustive scan above roughly this many vectors
+    HNSW_MIN_DOCUMENTS = 1000
+    
+    def __init__(self, dimension: int, use_flat: bool = True):
         """
         Initialize the vector store
         
         Args:
             dimension: Dimension of the embedding vectors
+            use_flat: Use an exhaustive scan instead of an HNSW graph (best for small corpora)
         """
         self.dimension = dimension
-        # Using L2 distance for similarity (can also use inner product)
-        self.index = faiss.IndexFlatL2(dimension)
+        self.use_flat = use_flat
+        # Inner product over L2-normalized vectors = cosine similarity.
+        # Vectors are stored as 8-bit scalar-quantized codes: 4x less memory streamed per query.
+        if use_flat:
+            self.index = faiss.IndexScalarQuantizer(
+                dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            self.index = faiss.IndexHNSWSQ(
+                dimension, faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT
+            )
+            self.index.hnsw.efConstruction = 200
         self.documents = []
         self.metadata = []
     
@@ -65,8 +259,12 @@ class VectorStore:
             documents: Original document texts
             metadata: Document metadata (title, category, etc.)
         """
-        # Ensure embeddings are float32 for FAISS
-        embeddings = embeddings.astype('float32')
+        # Ensure embeddings are float32 for FAISS and unit length for cosine scoring
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        faiss.normalize_L2(embeddings)
+        # The scalar quantizer learns per-dimension ranges from the corpus (one pass)
+        if not self.index.is_trained:
+            self.index.train(embeddings)
         self.index.add(embeddings)
         self.documents.extend(documents)
         self.metadata.extend(metadata)
@@ -83,121 +281,326 @@ class VectorStore:
         Returns:
             List of dictionaries containing document, metadata, and similarity score
         """
-        query_embedding = query_embedding.astype('float32').reshape(1, -1)
+        query_embedding = query_embedding.astype('float32').reshape(1, -1).copy()
+        faiss.normalize_L2(query_embedding)
         
         # Search the index
-        distances, indices = self.index.search(query_embedding, k)
+        if self.use_flat:
+            similarities, indices = self.index.search(query_embedding, k)
+        else:
+            # Per-call parameters: concurrent searches must not mutate shared index state
+            params = faiss.SearchParametersHNSW(efSearch=max(16, 4 * k))
+            similarities, indices = self.index.search(query_embedding, k, params=params)
         
         results = []
-        for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(self.documents):  # Valid index
-                # Convert L2 distance to similarity score (0-1 range)
-                # Lower distance = higher similarity
-                similarity = 1 / (1 + dist)
-                
+        for i, (similarity, idx) in enumerate(zip(similarities[0], indices[0])):
+            if 0 <= idx < len(self.documents):  # Valid index
                 results.append({
                     'rank': i + 1,
                     'document': self.documents[idx],
                     'metadata': self.metadata[idx],
-                    'similarity_score': float(similarity),
-                    'distance': float(dist)
+                    'similarity_score': float(similarity)
                 })
         
         return results
 
 
+class SemanticCache:
+    """Embedding-similarity cache for query responses"""
+    
+    # Neighbours inspected per lookup, so entries cached under other params don't hide a hit
+    SEARCH_NEIGHBORS = 8
+    
+    def __init__(self, dimension: int, threshold: float = 0.95, ttl: float = 3600.0, max_size: int = 256):
+        """
+        Initialize the semantic cache
+        
+        Args:
+            dimension: Dimension of the query embeddings
+            threshold: Minimum cosine similarity for a cached query to count as a hit
+            ttl: Seconds after which a cached response expires
+            max_size: Maximum number of cached queries before LRU eviction
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        # Inner product over L2-normalized vectors = cosine similarity
+        self.index = faiss.IndexFlatIP(dimension)
+        # Parallel to the index rows: [response, params, created_at, last_used]
+        self.entries = []
+        # Queries run concurrently in worker threads
+        self._lock = threading.Lock()
+    
+    def lookup(self, query_vector: np.ndarray, params: Tuple) -> Optional[Dict]:
+        """
+        Find a cached response for a near-duplicate query
+        
+        Args:
+            query_vector: L2-normalized query embedding of shape (1, dimension)
+            params: Query parameters the cached response must have been built with
+            
+        Returns:
+            Cached response dictionary, or None on a miss
+        """
+        with self._lock:
+            entry = self._find(query_vector, params, time.time())
+            if entry is None:
+                return None
+            
+            entry[3] = time.time()
+            return entry[0]
+    
+    def add(self, query_vector: np.ndarray, params: Tuple, response: Dict):
+        """
+        Insert a response into the cache, evicting the least recently used entry if full
+        
+        Args:
+            query_vector: L2-normalized query embedding of shape (1, dimension)
+            params: Query parameters the response was built with
+            response: Response dictionary to cache
+        """
+        if self.max_size <= 0:
+            return
+        
+        with self._lock:
+            now = time.time()
+            # A concurrent request may have cached the same query already; refresh it instead
+            entry = self._find(query_vector, params, now)
+            if entry is not None:
+                entry[0], entry[2], entry[3] = response, now, now
+                return
+            
+            self.index.add(query_vector)
+            self.entries.append([response, params, now, now])
+            
+            if len(self.entries) > self.max_size:
+                lru_idx = min(range(len(self.entries)), key=lambda i: self.entries[i][3])
+                self._remove(lru_idx)
+    
+    def _find(self, query_vector: np.ndarray, params: Tuple, now: float) -> Optional[List]:
+        """Return the closest live entry above the threshold built with `params` (caller holds the lock)"""
+        if self.index.ntotal == 0:
+            return None
+        
+        scores, indices = self.index.search(query_vector, min(self.index.ntotal, self.SEARCH_NEIGHBORS))
+        match, expired = None, []
+        for score, idx in zip(scores[0], indices[0]):
+            if idx < 0 or score < self.threshold:
+                break
+            entry = self.entries[idx]
+            if now - entry[2] >= self.ttl:
+                expired.append(int(idx))
+            elif match is None and entry[1] == params:
+                match = entry
+        
+        # Highest id first so earlier ids stay valid as FAISS and the list shift down
+        for idx in sorted(expired, reverse=True):
+            self._remove(idx)
+        return match
+    
+    def _remove(self, idx: int):
+        """Drop a single entry (caller holds the lock); FAISS shifts later ids down, matching list deletion"""
+        self.index.remove_ids(np.array([idx], dtype='int64'))
+        del self.entries[idx]
+
+
 class RAGEngine:
     """Main RAG engine orchestrating retrieval and generation"""
     
-    def __init__(self, kb_articles_path: str, openai_api_key: str = None):
+    INDEX_FILE = "kb.faiss"
+    META_FILE = "kb_meta.pkl"
+    # Bump when the indexing scheme changes so persisted indexes are rebuilt
+    INDEX_VERSION = 4
+    # Words per chunk including the title prefix. WordPiece yields ~1.3+ tokens per
+    # word, so 150 words stays inside the encoder's 256-token window (MAX_SEQ_LENGTH).
+    CHUNK_SIZE = 150
+    CHUNK_OVERLAP = 30
+    
+    def __init__(self, kb_articles_path: str, openai_api_key: str = None,
+                 cache_threshold: float = 0.95, cache_ttl: float = 3600.0, cache_size: int = 256,
+                 index_dir: str = None):
         """
         Initialize the RAG engine
         
         Args:
             kb_articles_path: Path to directory containing KB articles
             openai_api_key: OpenAI API key for answer generation
+            cache_threshold: Cosine similarity above which a previous query's response is reused
+            cache_ttl: Seconds a cached response stays valid
+            cache_size: Maximum number of cached responses (0 disables the cache)
+            index_dir: Directory for the persisted FAISS index (defaults to $RAG_INDEX_DIR or backend/.rag_index)
         """
         self.embedding_model = EmbeddingModel()
-        self.vector_store = VectorStore(self.embedding_model.dimension)
+        self.vector_store = None
+        self.index_dir = index_dir or os.getenv("RAG_INDEX_DIR") or DEFAULT_INDEX_DIR
         
         # Initialize OpenAI client
         self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         if self.openai_api_key:
             self.client = OpenAI(api_key=self.openai_api_key)
+            self.async_client = AsyncOpenAI(api_key=self.openai_api_key)
         else:
             print("Warning: No OpenAI API key provided. Answer generation will be disabled.")
             self.client = None
-        
-        # Load and index KB articles
-        self._load_kb_articles(kb_articles_path)
+            self.async_client = None
+        
+        # Reuse the persisted index when the KB files are unchanged, otherwise rebuild it
+        fingerprint = self._kb_fingerprint(kb_articles_path)
+        if not self._load_persisted_index(fingerprint):
+            self._load_kb_articles(kb_articles_path)
+            self._persist_index(fingerprint)
+        
+        self.cache = SemanticCache(
+            self.vector_store.dimension,
+            threshold=cache_threshold,
+            ttl=cache_ttl,
+            max_size=cache_size
+        )
     
     def _load_kb_articles(self, kb_articles_path: str):
         """Load KB articles from JSON files and index them"""
         print(f"Loading KB articles from: {kb_articles_path}")
         
+        kb = load_kb_store(kb_articles_path)
+        
         documents = []
         metadata = []
         
-        # Read all JSON files in the directory
-        for filename in os.listdir(kb_articles_path):
-            if filename.endswith('.json'):
-                filepath = os.path.join(kb_articles_path, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    article = json.load(f)
-                    
-                    # Combine title and content for better retrieval
-                    doc_text = f"{article['title']}\n\n{article['content']}"
-                    documents.append(doc_text)
-                    
-                    metadata.append({
-                        'title': article['title'],
-                        'category': article.get('category', 'General'),
-                        'tags': article.get('tags', []),
-                        'filename': filename
-                    })
+        for i in range(len(kb)):
+            # Index each chunk separately, prefixed with the title for better retrieval;
+            # the title counts against the chunk budget so nothing is truncated by the encoder
+            size = max(self.CHUNK_SIZE - len(kb.titles[i].split()), 2 * self.CHUNK_OVERLAP)
+            chunks = chunk_text(kb.contents[i], size=size, overlap=self.CHUNK_OVERLAP)
+            for chunk_id, chunk in enumerate(chunks):
+                documents.append(f"{kb.titles[i]}\n\n{chunk}")
+                metadata.append({
+                    'title': kb.titles[i],
+                    'category': kb.categories[i],
+                    'tags': kb.tags[i],
+                    'filename': kb.filenames[i],
+                    'chunk_id': chunk_id,
+                    'chunk_text': chunk
+                })
         
         if not documents:
             raise ValueError(f"No KB articles found in {kb_articles_path}")
         
-        # Generate embeddings and add to vector store
-        print(f"Generating embeddings for {len(documents)} articles...")
+        # Generate embeddings for all chunks in one batched pass and add to vector store
+        print(f"Generating embeddings for {len(documents)} chunks...")
         embeddings = self.embedding_model.encode(documents)
+        self.vector_store = VectorStore(
+            embeddings.shape[1],
+            use_flat=len(documents) < VectorStore.HNSW_MIN_DOCUMENTS
+        )
         self.vector_store.add_documents(embeddings, documents, metadata)
         print("KB articles indexed successfully!")
     
-    def retrieve(self, query: str, k: int = 3) -> List[Dict]:
+    def _kb_fingerprint(self, kb_articles_path: str) -> str:
+        """Hash the index version, embedding model/backend and the (filename, mtime) of every KB file"""
+        sources = sorted(
+            (filename, os.stat(os.path.join(kb_articles_path, filename)).st_mtime_ns)
+            for filename in os.listdir(kb_articles_path)
+            if filename.endswith('.json')
+        )
+        payload = repr((self.INDEX_VERSION, self.embedding_model.model_name, self.embedding_model.backend, sources)).encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+    
+    def _load_persisted_index(self, fingerprint: str) -> bool:
         """
-        Retrieve relevant documents for a query
+        Load the persisted index if it was built from the current KB files
         
         Args:
-            query: User query string
-            k: Number of documents to retrieve
+            fingerprint: Fingerprint of the current KB files
             
         Returns:
-            List of retrieved documents with scores
+            True if the vector store was loaded from disk
         """
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode([query])[0]
-        
-        # Search vector store
-        results = self.vector_store.search(query_embedding, k=k)
+        index_path = os.path.join(self.index_dir, self.INDEX_FILE)
+        meta_path = os.path.join(self.index_dir, self.META_FILE)
+        if not (os.path.exists(index_path) and os.path.exists(meta_path)):
+            return False
         
-        return results
+        try:
+            with open(meta_path, 'rb') as f:
+                meta = pickle.load(f)
+            if meta.get('fingerprint') != fingerprint:
+                print("Persisted index is stale, rebuilding")
+                return False
+            
+            index = faiss.read_index(index_path)
+        except Exception as e:
+            print(f"Warning: Could not load persisted index: {e}")
+            return False
+        
+        self.vector_store = VectorStore(index.d, use_flat=not hasattr(index, 'hnsw'))
+        self.vector_store.index = index
+        self.vector_store.documents = meta['documents']
+        self.vector_store.metadata = meta['metadata']
+        print(f"Loaded persisted index with {index.ntotal} documents from: {self.index_dir}")
+        return True
+    
+    def _persist_index(self, fingerprint: str):
+        """Write the FAISS index and document metadata to the index directory"""
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            faiss.write_index(self.vector_store.index, os.path.join(self.index_dir, self.INDEX_FILE))
+            with open(os.path.join(self.index_dir, self.META_FILE), 'wb') as f:
+                pickle.dump({
+                    'fingerprint': fingerprint,
+                    'documents': self.vector_store.documents,
+                    'metadata': self.vector_store.metadata
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # Read-only filesystems (e.g. serverless) just rebuild on every cold start
+            print(f"Warning: Could not persist index to {self.index_dir}: {e}")
     
-    def generate_answer(self, query: str, retrieved_docs: List[Dict]) -> str:
+    def retrieve(self, query: str, k: int = 3, query_embedding: Optional[np.ndarray] = None) -> List[Dict]:
         """
-        Generate an answer using retrieved documents and LLM
+        Retrieve relevant articles for a query
+        
+        Searches k*3 chunks and collapses them to the top-k unique articles,
+        scoring each article by its best chunk.
         
         Args:
-            query: User query
-            retrieved_docs: Retrieved documents from vector search
+            query: User query string
+            k: Number of articles to retrieve
+            query_embedding: Precomputed query embedding (skips re-encoding the query)
             
         Returns:
-            Generated answer string
+            List of retrieved articles with scores; 'document' holds only the matched chunks
         """
-        if not self.client:
-            return "Answer generation unavailable (no OpenAI API key provided)"
+        # Generate query embedding
+        if query_embedding is None:
+            query_embedding = np.frombuffer(self.embedding_model.encode_one(query), dtype=np.float32)
         
+        # Search vector store
+        chunk_results = self.vector_store.search(query_embedding, k=k * 3)
+        
+        # Collapse chunks to articles; results arrive best-first so the first hit sets the score
+        articles = {}
+        for result in chunk_results:
+            meta = result['metadata']
+            article = articles.get(meta['filename'])
+            if article is None:
+                if len(articles) == k:
+                    continue
+                article = articles[meta['filename']] = {
+                    'rank': len(articles) + 1,
+                    'metadata': {key: meta[key] for key in ('title', 'category', 'tags', 'filename')},
+                    'similarity_score': result['similarity_score'],
+                    'chunks': []
+                }
+            article['chunks'].append(meta)
+        
+        results = list(articles.values())
+        for article in results:
+            chunks = sorted(article.pop('chunks'), key=lambda c: c['chunk_id'])
+            article['document'] = "\n\n".join(c['chunk_text'] for c in chunks)
+        
+        return results
+    
+    def _build_messages(self, query: str, retrieved_docs: List[Dict]) -> List[Dict]:
+        """Build the chat messages for answer generation from the retrieved documents"""
         # Prepare context from retrieved documents
         context = "\n\n---\n\n".join([
             f"Article: {doc['metadata']['title']}\n{doc['document']}"
@@ -218,14 +621,61 @@ Knowledge Base Articles:
 
 Please provide a clear and helpful answer."""
         
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def generate_answer(self, query: str, retrieved_docs: List[Dict], raise_errors: bool = False) -> str:
+        """
+        Generate an answer using retrieved documents and LLM
+        
+        Args:
+            query: User query
+            retrieved_docs: Retrieved documents from vector search
+            raise_errors: Re-raise OpenAI errors instead of returning them as the answer text
+            
+        Returns:
+            Generated answer string
+        """
+        if not self.client:
+            return "Answer generation unavailable (no OpenAI API key provided)"
+        
         try:
             # Call OpenAI API
             response = self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=self._build_messages(query, retrieved_docs),
+                temperature=0.7,
+                max_tokens=500
+            )
+            
+            return response.choices[0].message.content
+        
+        except Exception as e:
+            if raise_errors:
+                raise
+            return f"Error generating answer: {str(e)}"
+    
+    async def agenerate_answer(self, query: str, retrieved_docs: List[Dict], raise_errors: bool = False) -> str:
+        """
+        Async variant of generate_answer that awaits the OpenAI call without blocking the event loop
+        
+        Args:
+            query: User query
+            retrieved_docs: Retrieved documents from vector search
+            raise_errors: Re-raise OpenAI errors instead of returning them as the answer text
+            
+        Returns:
+            Generated answer string
+        """
+        if not self.async_client:
+            return "Answer generation unavailable (no OpenAI API key provided)"
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._build_messages(query, retrieved_docs),
                 temperature=0.7,
                 max_tokens=500
             )
@@ -233,6 +683,8 @@ Please provide a clear and helpful answer."""
             return response.choices[0].message.content
         
         except Exception as e:
+            if raise_errors:
+                raise
             return f"Error generating answer: {str(e)}"
     
     def calculate_confidence(self, retrieved_docs: List[Dict]) -> float:
@@ -245,22 +697,93 @@ Please provide a clear and helpful answer."""
         Returns:
             Confidence score between 0 and 1
         """
-        if not retrieved_docs:
-            return 0.0
+        return calculate_confidence(retrieved_docs)
+    
+    async def astream_answer(self, query: str, retrieved_docs: List[Dict], raise_errors: bool = False) -> AsyncIterator[str]:
+        """
+        Stream the generated answer token by token as OpenAI produces it
         
-        # Use weighted average of top results
-        # Give more weight to the top result
-        weights = [0.5, 0.3, 0.2]  # For top 3 results
+        Args:
+            query: User query
+            retrieved_docs: Retrieved documents from vector search
+            raise_errors: Re-raise OpenAI errors instead of yielding them as answer text
+            
+        Yields:
+            Answer text fragments
+        """
+        if not self.async_client:
+            yield "Answer generation unavailable (no OpenAI API key provided)"
+            return
         
-        confidence = 0.0
-        for i, doc in enumerate(retrieved_docs[:3]):
-            weight = weights[i] if i < len(weights) else 0.0
-            confidence += doc['similarity_score'] * weight
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._build_messages(query, retrieved_docs),
+                temperature=0.7,
+                max_tokens=500,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        
+        except Exception as e:
+            if raise_errors:
+                raise
+            yield f"Error generating answer: {str(e)}"
+    
+    def _retrieve_for_query(self, query: str, k: int, use_llm: bool) -> Tuple[Optional[Dict], np.ndarray, List[Dict]]:
+        """
+        Embed the query, check the semantic cache and retrieve documents on a miss
+        
+        Returns:
+            (cached response or None, normalized query vector, retrieved documents)
+        """
+        # Embed once; the vector serves both the cache lookup and retrieval
+        query_embedding = np.frombuffer(self.embedding_model.encode_one(query), dtype=np.float32)
+        cache_vector = query_embedding.astype('float32').reshape(1, -1).copy()
+        faiss.normalize_L2(cache_vector)
         
-        # Normalize to 0-1 range
-        confidence = min(max(confidence, 0.0), 1.0)
+        # Serve near-duplicate queries from the semantic cache
+        cached = self.cache.lookup(cache_vector, (k, use_llm))
+        if cached is not None:
+            print("Semantic cache hit")
+            return dict(cached, query=query), cache_vector, []
         
-        return confidence
+        # Retrieve relevant documents
+        retrieved_docs = self.retrieve(query, k=k, query_embedding=query_embedding)
+        return None, cache_vector, retrieved_docs
+    
+    def _fast_answer(self, retrieved_docs: List[Dict]) -> str:
+        """Fast response without LLM - use top article content"""
+        if retrieved_docs:
+            top_article = retrieved_docs[0]
+            return f"Based on the knowledge base article '{top_article['metadata']['title']}', here's what I found:\n\n{top_article['document'][:500]}..."
+        return "No relevant information found in the knowledge base."
+    
+    def format_articles(self, retrieved_docs: List[Dict]) -> List[Dict]:
+        """Shape retrieved documents into the API's retrieved_articles entries"""
+        return [
+            {
+                'rank': doc['rank'],
+                'title': doc['metadata']['title'],
+                'category': doc['metadata']['category'],
+                'tags': doc['metadata']['tags'],
+                'similarity_score': doc['similarity_score'],
+                'content_preview': doc['document'][:300] + "..."
+            }
+            for doc in retrieved_docs
+        ]
+    
+    def _build_response(self, query: str, retrieved_docs: List[Dict], answer: str, confidence: float) -> Dict:
+        """Shape retrieval results and answer into the API response dictionary"""
+        return {
+            'query': query,
+            'retrieved_articles': self.format_articles(retrieved_docs),
+            'answer': answer,
+            'confidence_score': confidence,
+            'num_retrieved': len(retrieved_docs)
+        }
     
     def query(self, query: str, k: int = 3, generate_answer: bool = True) -> Dict:
         """
@@ -276,40 +799,119 @@ Please provide a clear and helpful answer."""
         """
         print(f"\nProcessing query: {query}")
         
-        # Retrieve relevant documents
-        retrieved_docs = self.retrieve(query, k=k)
+        use_llm = bool(generate_answer and self.client)
+        cached, cache_vector, retrieved_docs = self._retrieve_for_query(query, k, use_llm)
+        if cached is not None:
+            return cached
         
         # Calculate confidence
         confidence = self.calculate_confidence(retrieved_docs)
         
         # Generate answer only if requested and OpenAI is available
-        if generate_answer and self.client:
-            answer = self.generate_answer(query, retrieved_docs)
+        generation_failed = False
+        if use_llm:
+            try:
+                answer = self.generate_answer(query, retrieved_docs, raise_errors=True)
+            except Exception as e:
+                answer = f"Error generating answer: {str(e)}"
+                generation_failed = True
         else:
-            # Fast response without LLM - use top article content
-            if retrieved_docs:
-                top_article = retrieved_docs[0]
-                answer = f"Based on the knowledge base article '{top_article['metadata']['title']}', here's what I found:\n\n{top_article['document'][:500]}..."
-            else:
-                answer = "No relevant information found in the knowledge base."
+            answer = self._fast_answer(retrieved_docs)
         
-        # Prepare response
-        response = {
-            'query': query,
-            'retrieved_articles': [
-                {
-                    'rank': doc['rank'],
-                    'title': doc['metadata']['title'],
-                    'category': doc['metadata']['category'],
-                    'tags': doc['metadata']['tags'],
-                    'similarity_score': doc['similarity_score'],
-                    'content_preview': doc['document'][:300] + "..."
-                }
-                for doc in retrieved_docs
-            ],
-            'answer': answer,
-            'confidence_score': confidence,
-            'num_retrieved': len(retrieved_docs)
-        }
+        response = self._build_response(query, retrieved_docs, answer, confidence)
+        # Never cache a failed generation; the next near-duplicate query should retry
+        if not generation_failed:
+            self.cache.add(cache_vector, (k, use_llm), response)
+        
+        return response
+    
+    async def aquery(self, query: str, k: int = 3, generate_answer: bool = True) -> Dict:
+        """
+        Async variant of query for use inside an event loop
+        
+        Embedding and vector search run in a worker thread and the OpenAI call
+        is awaited, so concurrent requests overlap instead of serializing.
+        
+        Args:
+            query: User query string
+            k: Number of documents to retrieve
+            generate_answer: Whether to generate AI answer (slower) or just retrieve
+            
+        Returns:
+            Dictionary containing retrieved docs, answer, and confidence
+        """
+        print(f"\nProcessing query: {query}")
+        
+        use_llm = bool(generate_answer and self.async_client)
+        cached, cache_vector, retrieved_docs = await asyncio.to_thread(
+            self._retrieve_for_query, query, k, use_llm
+        )
+        if cached is not None:
+            return cached
+        
+        confidence = self.calculate_confidence(retrieved_docs)
+        
+        generation_failed = False
+        if use_llm:
+            try:
+                answer = await self.agenerate_answer(query, retrieved_docs, raise_errors=True)
+            except Exception as e:
+                answer = f"Error generating answer: {str(e)}"
+                generation_failed = True
+        else:
+            answer = self._fast_answer(retrieved_docs)
+        
+        response = self._build_response(query, retrieved_docs, answer, confidence)
+        if not generation_failed:
+            self.cache.add(cache_vector, (k, use_llm), response)
         
         return response
+    
+    async def astream_query(self, query: str, k: int = 3, generate_answer: bool = True) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Streaming variant of aquery
+        
+        Args:
+            query: User query string
+            k: Number of documents to retrieve
+            generate_answer: Whether to generate AI answer (slower) or just retrieve
+            
+        Yields:
+            (event, data) pairs: one 'retrieval' event with the retrieved articles and
+            confidence, then 'token' events with answer fragments, then 'done'
+        """
+        print(f"\nProcessing streaming query: {query}")
+        
+        use_llm = bool(generate_answer and self.async_client)
+        cached, cache_vector, retrieved_docs = await asyncio.to_thread(
+            self._retrieve_for_query, query, k, use_llm
+        )
+        
+        if cached is not None:
+            response = cached
+        else:
+            confidence = self.calculate_confidence(retrieved_docs)
+            response = self._build_response(query, retrieved_docs, None, confidence)
+        
+        yield 'retrieval', {key: value for key, value in response.items() if key != 'answer'}
+        
+        if cached is not None:
+            yield 'token', {'content': cached['answer']}
+        elif use_llm:
+            fragments = []
+            try:
+                async for fragment in self.astream_answer(query, retrieved_docs, raise_errors=True):
+                    fragments.append(fragment)
+                    yield 'token', {'content': fragment}
+            except Exception as e:
+                # Report the failure to the client but leave the cache untouched
+                yield 'token', {'content': f"Error generating answer: {str(e)}"}
+            else:
+                response['answer'] = "".join(fragments)
+                self.cache.add(cache_vector, (k, use_llm), response)
+        else:
+            response['answer'] = self._fast_answer(retrieved_docs)
+            yield 'token', {'content': response['answer']}
+            self.cache.add(cache_vector, (k, use_llm), response)
+        
+        yield 'done', {}
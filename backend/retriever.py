@@ -0,0 +1,157 @@
+"""
+Retrieval backends for the Hiver RAG API
+TF-IDF (scikit-learn) and dense (SentenceTransformer + FAISS) behind one interface;
+each backend imports its heavy dependencies only when constructed
+"""
+
+import asyncio
+import numpy as np
+from typing import List, Dict, Tuple, AsyncIterator, Protocol
+
+from kb_store import load_kb_store
+from scoring import calculate_confidence
+
+
+class Retriever(Protocol):
+    """Interface the API uses to query the knowledge base"""
+    
+    def search(self, query: str, k: int = 3) -> List[Dict]:
+        """Return the top-k articles as retrieved_articles entries"""
+        ...
+    
+    async def aquery(self, query: str, k: int = 3, generate_answer: bool = True) -> Dict:
+        """Return the full query response (articles, answer, confidence)"""
+        ...
+    
+    def astream_query(self, query: str, k: int = 3, generate_answer: bool = True) -> AsyncIterator[Tuple[str, Dict]]:
+        """Yield ('retrieval' | 'token' | 'done', data) events for a streamed response"""
+        ...
+    
+    def stats(self) -> Dict:
+        """Return statistics about the indexed knowledge base"""
+        ...
+
+
+class TfidfRetriever:
+    """Lightweight TF-IDF retrieval; answers with the top article's content (no LLM)"""
+    
+    def __init__(self, kb_articles_path: str, openai_api_key: str = None):
+        """
+        Load KB articles and fit the TF-IDF vectorizer
+        
+        Args:
+            kb_articles_path: Path to directory containing KB articles
+            openai_api_key: Unused; accepted for interface parity with DenseRetriever
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        self.kb = load_kb_store(kb_articles_path)
+        print(f"✅ Loaded {len(self.kb)} articles")
+        
+        # norm='l2' makes every row unit length, so a dot product is the cosine similarity
+        self.vectorizer = TfidfVectorizer(stop_words='english', max_features=1000, norm='l2')
+        # Title and content were combined once at load time for better matching
+        self.article_vectors = self.vectorizer.fit_transform(self.kb.joined).tocsr()
+        print("✅ Vectorizer initialized")
+    
+    def search(self, query: str, k: int = 3) -> List[Dict]:
+        """Search for relevant articles"""
+        return self._search(query, k)[1]
+    
+    def _search(self, query: str, k: int) -> Tuple[np.ndarray, List[Dict]]:
+        """Return the top-k article indices (best first) alongside their retrieved_articles entries"""
+        # Vectorize query (already L2-normalized by the vectorizer)
+        query_vector = self.vectorizer.transform([query])
+        
+        # Calculate cosine similarities against the pre-normalized article rows
+        similarities = (self.article_vectors @ query_vector.T).toarray().ravel()
+        
+        # Get top k: O(N) partial selection, then sort only the survivors
+        idx = np.argpartition(-similarities, min(k, len(similarities) - 1))[:k]
+        top_indices = idx[np.argsort(-similarities[idx])]
+        
+        kb = self.kb
+        results = []
+        for rank, idx in enumerate(top_indices, 1):
+            results.append({
+                'rank': rank,
+                'title': kb.titles[idx],
+                'category': kb.categories[idx],
+                'tags': kb.tags[idx],
+                'similarity_score': float(similarities[idx]),
+                'content_preview': kb.contents[idx][:300] + "..."
+            })
+        
+        return top_indices, results
+    
+    def generate_answer(self, query: str, results: List[Dict], top_indices: np.ndarray) -> str:
+        """Generate answer from top result (top_indices[0] is its position in the KB arrays)"""
+        if not results:
+            return "No relevant information found in the knowledge base."
+        
+        top_article = results[0]
+        article_content = self.kb.contents[top_indices[0]]
+        
+        return f"Based on the article '{top_article['title']}', here's what I found:\n\n{article_content[:500]}..."
+    
+    def query(self, query: str, k: int = 3) -> Dict:
+        """Search, score and answer a query"""
+        top_indices, results = self._search(query, k)
+        return {
+            'query': query,
+            'retrieved_articles': results,
+            'answer': self.generate_answer(query, results, top_indices),
+            'confidence_score': calculate_confidence(results),
+            'num_retrieved': len(results)
+        }
+    
+    async def aquery(self, query: str, k: int = 3, generate_answer: bool = True) -> Dict:
+        return await asyncio.to_thread(self.query, query, k)
+    
+    async def astream_query(self, query: str, k: int = 3, generate_answer: bool = True) -> AsyncIterator[Tuple[str, Dict]]:
+        response = await self.aquery(query, k=k)
+        yield 'retrieval', {key: value for key, value in response.items() if key != 'answer'}
+        yield 'token', {'content': response['answer']}
+        yield 'done', {}
+    
+    def stats(self) -> Dict:
+        return {
+            "total_articles": len(self.kb),
+            "vocabulary_size": len(self.vectorizer.vocabulary_),
+            "model_name": "tfidf"
+        }
+
+
+class DenseRetriever:
+    """SentenceTransformer + FAISS retrieval with optional OpenAI answer generation"""
+    
+    def __init__(self, kb_articles_path: str, openai_api_key: str = None):
+        """
+        Build (or load the persisted) dense index
+        
+        Args:
+            kb_articles_path: Path to directory containing KB articles
+            openai_api_key: OpenAI API key for answer generation
+        """
+        # Imported here so TF-IDF deployments never load torch/faiss
+        from rag_engine import RAGEngine
+        
+        self.engine = RAGEngine(kb_articles_path, openai_api_key)
+    
+    def search(self, query: str, k: int = 3) -> List[Dict]:
+        return self.engine.format_articles(self.engine.retrieve(query, k=k))
+    
+    async def aquery(self, query: str, k: int = 3, generate_answer: bool = True) -> Dict:
+        return await self.engine.aquery(query, k=k, generate_answer=generate_answer)
+    
+    def astream_query(self, query: str, k: int = 3, generate_answer: bool = True) -> AsyncIterator[Tuple[str, Dict]]:
+        return self.engine.astream_query(query, k=k, generate_answer=generate_answer)
+    
+    def stats(self) -> Dict:
+        vector_store = self.engine.vector_store
+        return {
+            "total_articles": len({m['filename'] for m in vector_store.metadata}),
+            "total_chunks": len(vector_store.documents),
+            "embedding_dimension": vector_store.dimension,
+            "model_name": self.engine.embedding_model.model_name
+        }
@@ -0,0 +1,28 @@
+"""
+Confidence scoring shared by the RAG backends
+"""
+
+import numpy as np
+from typing import List, Dict
+
+
+# Weights for the top 3 results; more weight on the top result
+CONFIDENCE_WEIGHTS = np.array([0.5, 0.3, 0.2], dtype=np.float32)
+
+
+def calculate_confidence(results: List[Dict]) -> float:
+    """
+    Calculate confidence score based on retrieval results
+    
+    Args:
+        results: Retrieved results with a 'similarity_score' each, best first
+    
+    Returns:
+        Weighted sum of the top scores, clipped to 0-1
+    """
+    if not results:
+        return 0.0
+    
+    n = min(len(CONFIDENCE_WEIGHTS), len(results))
+    scores = np.fromiter((r['similarity_score'] for r in results[:n]), dtype=np.float32, count=n)
+    return float(np.clip(scores @ CONFIDENCE_WEIGHTS[:n], 0.0, 1.0))